@@ -1,21 +1,89 @@
 """API endpoints for product-related operations."""
+import hashlib
 from datetime import datetime, timedelta
 from typing import Optional, List
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
-from fastapi.responses import JSONResponse
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import JSONResponse, StreamingResponse
+import msgspec
 from sqlalchemy.ext.asyncio import AsyncSession
 
-from app.database import get_db
+from app.database import get_db, get_read_db, get_stream_db
 from app.models.product import ProductResponse, ProductListResponse
 from app.services.product_service import ProductService
 
 router = APIRouter(prefix="/products", tags=["products"])
 
+PRODUCT_CACHE_CONTROL = "public, max-age=86400"
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Check an If-None-Match header against an ETag using weak comparison.
+    
+    Args:
+        if_none_match: Raw If-None-Match header value, if any
+        etag: Current quoted ETag of the resource
+        
+    Returns:
+        True if the header lists the ETag (strong or weak) or is "*"
+    """
+    if not if_none_match:
+        return False
+    
+    for tag in if_none_match.split(","):
+        tag = tag.strip()
+        if tag == "*":
+            return True
+        # Proxies that re-compress responses weaken the ETag to W/"..."
+        if tag.startswith("W/"):
+            tag = tag[2:]
+        if tag == etag:
+            return True
+    return False
+
+
+@router.get("/stream")
+async def stream_products(
+    q: Optional[str] = Query(None, min_length=2, description="Search query"),
+    category: Optional[str] = Query(None, description="Filter by category"),
+    page: int = Query(1, ge=1, description="Page number"),
+    page_size: int = Query(10, ge=1, le=100, description="Items per page"),
+    db: AsyncSession = Depends(get_stream_db)
+):
+    """
+    Stream search results as newline-delimited JSON.
+    
+    Takes the same parameters as the search endpoint, but sends one product
+    per line as rows are read instead of building the whole page first.
+    Pagination totals are not included.
+    
+    Args:
+        q: Search query (searches in name, brand, and category)
+        category: Filter by category
+        page: Page number (1-based)
+        page_size: Number of items per page (1-100)
+        
+    Returns:
+        NDJSON stream of matching products
+    """
+    if not q and not category:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one of 'q' or 'category' parameters is required"
+        )
+    
+    service = ProductService(db)
+    return StreamingResponse(
+        service.stream_products(query=q, category=category, page=page, page_size=page_size),
+        media_type="application/x-ndjson"
+    )
+
 
 @router.get("/{barcode}", response_model=ProductResponse)
 async def get_product(
     barcode: str,
+    request: Request,
     force_refresh: bool = False,
     db: AsyncSession = Depends(get_db)
 ):
@@ -28,12 +96,15 @@ async def get_product(
     3. Parse and store the product data
     4. Return the product
     
+    Responses carry an ETag derived from the product's last update so that
+    clients and shared caches can revalidate with If-None-Match.
+    
     Args:
         barcode: Product barcode (EAN-13, UPC, etc.)
         force_refresh: If True, bypass cache and fetch fresh data from Open Food Facts
         
     Returns:
-        Product data if found, 404 if not found
+        Product data if found, 304 if the client's copy is current, 404 if not found
     """
     service = ProductService(db)
     product = await service.get_by_barcode(barcode, force_refresh=force_refresh)
@@ -44,7 +115,20 @@ async def get_product(
             detail=f"Product with barcode {barcode} not found"
         )
     
-    return product
+    etag = '"' + hashlib.md5(
+        f"{product.id}:{product.last_updated.isoformat()}".encode()
+    ).hexdigest() + '"'
+    headers = {"ETag": etag, "Cache-Control": PRODUCT_CACHE_CONTROL}
+    
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    # Encode the msgspec struct directly, skipping response model validation
+    return Response(
+        content=msgspec.json.encode(product),
+        media_type="application/json",
+        headers=headers
+    )
 
 
 @router.post("/seed/{category}")
@@ -85,7 +169,7 @@ async def search_products(
     category: Optional[str] = Query(None, description="Filter by category"),
     page: int = Query(1, ge=1, description="Page number"),
     page_size: int = Query(10, ge=1, le=100, description="Items per page"),
-    db: AsyncSession = Depends(get_db)
+    db: AsyncSession = Depends(get_read_db)
 ):
     """
     Search for products with optional filtering.
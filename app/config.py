@@ -5,6 +5,9 @@ from typing import Optional
 from pydantic import PostgresDsn, validator
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+# Port PgBouncer listens on in front of Postgres (transaction pooling)
+PGBOUNCER_PORT = 6432
+
 
 class Settings(BaseSettings):
     """Application settings."""
@@ -24,9 +27,18 @@ class Settings(BaseSettings):
     
     # Caching
     PRODUCT_CACHE_DAYS: int = 30
+    REDIS_URL: str = "redis://localhost:6379/0"
+    REDIS_MAX_CONNECTIONS: int = 50
+    # Keep Redis timeouts short so a hung cache falls back to Postgres quickly
+    REDIS_SOCKET_TIMEOUT_SECONDS: float = 0.5
+    CACHE_WARM_SIZE: int = 1000
+    CACHE_WARM_INTERVAL_SECONDS: int = 3600
     
     # Database
     DATABASE_URL: Optional[PostgresDsn] = None
+    # Direct (session-mode) connection for LISTEN/NOTIFY, which PgBouncer in
+    # transaction mode does not support. Falls back to DATABASE_URL.
+    DATABASE_LISTEN_URL: Optional[str] = None
     
     @validator("DATABASE_URL", pre=True)
     def assemble_db_connection(cls, v: Optional[str], values: dict) -> str:
@@ -34,11 +46,13 @@ class Settings(BaseSettings):
         if isinstance(v, str):
             return v
         
+        # Connect through PgBouncer (transaction pooling) with the async driver
         return PostgresDsn.build(
-            scheme="postgresql",
+            scheme="postgresql+asyncpg",
             username="postgres",
             password=values.get("SUPABASE_SERVICE_KEY"),
             host=values["SUPABASE_URL"].replace("https://", ""),
+            port=PGBOUNCER_PORT,
             path=f"/postgres",
         )
     
@@ -1,25 +1,57 @@
 """Database connection and session management."""
-from typing import AsyncGenerator
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncGenerator, AsyncIterator
+from uuid import uuid4
 
+import asyncpg
+from redis.asyncio import ConnectionPool, Redis
+from redis.exceptions import RedisError
+from sqlalchemy import text
+from sqlalchemy.engine import make_url
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession, async_sessionmaker
 from sqlalchemy.orm import declarative_base
-from sqlalchemy.pool import NullPool
+from sqlmodel import SQLModel
 
-from app.config import get_settings
+from app.config import PGBOUNCER_PORT, get_settings
 
+logger = logging.getLogger(__name__)
 settings = get_settings()
 
-# Create async engine
+# Postgres channel notified by the products trigger with the changed barcode
+PRODUCT_CHANGES_CHANNEL = "product_changes"
+
+# Body of the products trigger function, compared against pg_proc so the
+# function is only replaced when it changes
+_NOTIFY_PRODUCT_CHANGE_BODY = f"""
+BEGIN
+    PERFORM pg_notify('{PRODUCT_CHANGES_CHANNEL}', OLD.barcode);
+    RETURN NULL;
+END;
+"""
+
+# Create async engine. The pool is sized for concurrent request load and
+# checks out connections LIFO so a small set of them stays warm. PgBouncer in
+# transaction mode can hand each transaction a different server connection, so
+# both asyncpg's and SQLAlchemy's prepared statement caches are disabled and
+# statements get unique names instead of asyncpg's per-connection sequence.
 engine = create_async_engine(
-    settings.DATABASE_URL,
+    str(settings.DATABASE_URL),
     echo=settings.APP_ENV == "development",
     future=True,
     pool_pre_ping=True,
-    pool_recycle=300,
-    pool_size=5,
-    max_overflow=10,
-    pool_timeout=30,
-    poolclass=NullPool if settings.APP_ENV == "test" else None,
+    pool_recycle=1800,
+    pool_size=20,
+    max_overflow=40,
+    pool_timeout=10,
+    pool_use_lifo=True,
+    connect_args={
+        "server_settings": {"jit": "off"},
+        "statement_cache_size": 0,
+        "prepared_statement_cache_size": 0,
+        "prepared_statement_name_func": lambda: f"__asyncpg_{uuid4()}__",
+    },
 )
 
 # Create async session factory
@@ -31,6 +63,32 @@ async_session_factory = async_sessionmaker(
     autocommit=False,
 )
 
+# Create session factory for reads. Its engine shares the pool above but runs
+# connections in autocommit mode, so reads skip the BEGIN/COMMIT round trips.
+# Sessions only check out a connection when they first execute.
+read_session_factory = async_sessionmaker(
+    bind=engine.execution_options(isolation_level="AUTOCOMMIT"),
+    class_=AsyncSession,
+    expire_on_commit=False,
+    autoflush=False,
+)
+
+# Create Redis client backed by a shared connection pool
+redis_pool = ConnectionPool.from_url(
+    settings.REDIS_URL,
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    socket_connect_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+    decode_responses=True,
+)
+redis = Redis(connection_pool=redis_pool)
+
+
+def product_cache_key(barcode: str) -> str:
+    """Build the Redis key for a cached product."""
+    return f"product:{barcode}"
+
+
 # Base class for all models
 Base = declarative_base()
 
@@ -53,13 +111,123 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.close()
 
 
+@asynccontextmanager
+async def read_session() -> AsyncIterator[AsyncSession]:
+    """
+    Open a session for read-only work.
+    
+    The connection runs in autocommit mode, so reads skip the BEGIN/COMMIT
+    round trips of a regular transaction. No connection is taken from the
+    pool until the session first executes a statement.
+    
+    Yields:
+        AsyncSession: Read-only database session
+    """
+    async with read_session_factory() as session:
+        yield session
+
+
+async def get_read_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function that yields read-only database sessions.
+    
+    Yields:
+        AsyncSession: Read-only database session
+    """
+    async with read_session() as session:
+        yield session
+
+
+async def get_stream_db() -> AsyncGenerator[AsyncSession, None]:
+    """
+    Dependency function that yields sessions for streamed reads.
+    
+    Server-side cursors only exist inside a transaction, which autocommit
+    read sessions never start, so the session opens a read-only transaction
+    instead. It stays open until the streamed response has been sent.
+    
+    Yields:
+        AsyncSession: Database session in a read-only transaction
+    """
+    async with async_session_factory() as session:
+        await session.connection(execution_options={"postgresql_readonly": True})
+        yield session
+
+
 async def init_db() -> None:
     """Initialize database tables."""
-    from app.models.product import Product, NormalizedNutrition  # noqa: F401
+    from app.models.product import Product, NormalizedNutrition, SEARCH_VECTOR_EXPRESSION  # noqa: F401
     
     async with engine.begin() as conn:
-        # Create all tables
-        await conn.run_sync(Base.metadata.create_all)
+        # Workers start together, so run schema setup one worker at a time
+        await conn.execute(text("SELECT pg_advisory_xact_lock(hashtext('init_db'))"))
+        
+        # Create all tables (the models are SQLModel tables)
+        await conn.run_sync(SQLModel.metadata.create_all)
+        
+        # create_all doesn't alter existing tables, so add columns introduced
+        # after a products table was first created. ALTER TABLE locks the
+        # table even when the column exists, so only run it when it's missing.
+        await conn.execute(
+            text(
+                f"""
+                DO $$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM information_schema.columns
+                        WHERE table_schema = current_schema()
+                          AND table_name = 'products'
+                          AND column_name = 'search_vector'
+                    ) THEN
+                        ALTER TABLE products ADD COLUMN search_vector tsvector
+                        GENERATED ALWAYS AS ({SEARCH_VECTOR_EXPRESSION}) STORED;
+                    END IF;
+                END
+                $$
+                """
+            )
+        )
+        
+        # Timestamps moved to database-generated timestamptz. Convert columns
+        # still stored as naive UTC and install the now() defaults. Each
+        # ALTER TABLE locks the table, so only touch columns that need it.
+        await conn.execute(
+            text(
+                """
+                DO $$
+                DECLARE
+                    col text;
+                BEGIN
+                    FOR col IN
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = current_schema()
+                          AND table_name = 'products'
+                          AND column_name IN ('created_at', 'updated_at', 'last_updated')
+                          AND data_type = 'timestamp without time zone'
+                    LOOP
+                        EXECUTE format(
+                            'ALTER TABLE products ALTER COLUMN %I TYPE timestamptz USING %I AT TIME ZONE ''UTC''',
+                            col, col
+                        );
+                    END LOOP;
+
+                    FOR col IN
+                        SELECT column_name FROM information_schema.columns
+                        WHERE table_schema = current_schema()
+                          AND table_name = 'products'
+                          AND column_name IN ('created_at', 'updated_at', 'last_updated')
+                          AND column_default IS NULL
+                    LOOP
+                        EXECUTE format(
+                            'ALTER TABLE products ALTER COLUMN %I SET DEFAULT now()',
+                            col
+                        );
+                    END LOOP;
+                END
+                $$
+                """
+            )
+        )
         
         # Create indexes
         # Create composite index for normalized_nutrition
@@ -72,9 +240,129 @@ async def init_db() -> None:
                 ON normalized_nutrition (sugar_100g, sodium_100g, protein_100g, fiber_100g)
                 """
             )
+        
+        # Create GIN index for full-text product search
+        await conn.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_products_fts
+                ON products USING GIN (search_vector)
+                """
+            )
+        )
+        
+        # Create trigram index so substring category filters can use an index
+        await conn.execute(text("CREATE EXTENSION IF NOT EXISTS pg_trgm"))
+        await conn.execute(
+            text(
+                """
+                CREATE INDEX IF NOT EXISTS idx_products_category_trgm
+                ON products USING GIN (category gin_trgm_ops)
+                """
+            )
+        )
+        
+        # Notify listeners when product data changes so cached copies can be
+        # evicted. Inserts are skipped: a new row has no cached copy yet.
+        # Replacing the function or trigger locks the products table, so
+        # only do it when the catalog shows them missing or different.
+        await conn.execute(
+            text(
+                f"""
+                DO $do$
+                BEGIN
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_proc
+                        WHERE oid = to_regproc('notify_product_change')
+                          AND prosrc = $fn${_NOTIFY_PRODUCT_CHANGE_BODY}$fn$
+                    ) THEN
+                        CREATE OR REPLACE FUNCTION notify_product_change() RETURNS trigger
+                        AS $fn${_NOTIFY_PRODUCT_CHANGE_BODY}$fn$ LANGUAGE plpgsql;
+                    END IF;
+                    
+                    -- tgtype 25 is FOR EACH ROW (1) | DELETE (8) | UPDATE (16), AFTER
+                    IF NOT EXISTS (
+                        SELECT 1 FROM pg_trigger
+                        WHERE tgrelid = 'products'::regclass
+                          AND tgname = 'products_notify'
+                          AND tgfoid = 'notify_product_change'::regproc
+                          AND tgtype = 25
+                    ) THEN
+                        DROP TRIGGER IF EXISTS products_notify ON products;
+                        CREATE TRIGGER products_notify
+                        AFTER UPDATE OR DELETE ON products
+                        FOR EACH ROW EXECUTE FUNCTION notify_product_change();
+                    END IF;
+                END
+                $do$
+                """
+            )
+        )
+
+
+async def listen_for_product_changes() -> None:
+    """
+    Evict cached products whenever Postgres reports a product change.
+    
+    Holds a dedicated connection listening on the product changes channel
+    and reconnects if it drops. Runs until cancelled. Does not start when
+    the connection would go through PgBouncer, where LISTEN receives nothing.
+    """
+    dsn = str(settings.DATABASE_LISTEN_URL or settings.DATABASE_URL)
+    if make_url(dsn).port == PGBOUNCER_PORT:
+        logger.warning(
+            "Product change listener not started: it would connect through PgBouncer, "
+            "which drops LISTEN notifications in transaction mode. Set "
+            "DATABASE_LISTEN_URL to a direct Postgres connection to enable it."
+        )
+        return
+    
+    dsn = dsn.replace("postgresql+asyncpg://", "postgresql://")
+    
+    async def _evict(connection, pid, channel, barcode: str) -> None:
+        try:
+            await redis.delete(product_cache_key(barcode))
+        except RedisError as e:
+            logger.warning(f"Redis invalidation failed for product {barcode}: {e}")
+    
+    while True:
+        conn = None
+        try:
+            conn = await asyncpg.connect(dsn)
+            await conn.add_listener(PRODUCT_CHANGES_CHANNEL, _evict)
+            logger.info(f"Listening for notifications on {PRODUCT_CHANGES_CHANNEL}")
+            while not conn.is_closed():
+                await asyncio.sleep(30)
+            logger.warning("Product change listener connection closed, reconnecting")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"Product change listener failed: {e}", exc_info=True)
+        finally:
+            if conn is not None and not conn.is_closed():
+                await conn.close()
+        
+        await asyncio.sleep(5)
+
+
+async def warm_pool(size: int = 10) -> None:
+    """
+    Open connections ahead of traffic so early requests skip the handshake.
+    
+    Args:
+        size: Number of pooled connections to open
+    """
+    async def _ping() -> None:
+        async with engine.connect() as conn:
+            await conn.execute(text("SELECT 1"))
+    
+    # Check out connections concurrently so each ping opens a distinct one
+    await asyncio.gather(*(_ping() for _ in range(size)))
 
 
 async def close_db() -> None:
-    """Close database connection."""
+    """Close database and cache connections."""
     if engine:
-        await engine.dispose()
\ No newline at end of file
+        await engine.dispose()
+    await redis.close()
+    await redis_pool.disconnect()
\ No newline at end of file
@@ -1,14 +1,23 @@
 """Main FastAPI application."""
+import asyncio
 import logging
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 from fastapi import FastAPI, Request, status
 from fastapi.exceptions import RequestValidationError
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, ORJSONResponse
 
 from app.config import get_settings, Settings
-from app.database import init_db, close_db
+from app.database import (
+    async_session_factory,
+    init_db,
+    close_db,
+    listen_for_product_changes,
+    warm_pool,
+)
 from app.api import products as products_router
+from app.middleware import StreamingAwareGZipMiddleware
+from app.services.product_service import ProductService
 
 # Configure logging
 logging.basicConfig(
@@ -20,6 +29,18 @@ logger = logging.getLogger(__name__)
 # Get application settings
 settings = get_settings()
 
+async def warm_cache_periodically() -> None:
+    """Warm Redis with recently accessed products, then re-warm on an interval."""
+    while True:
+        try:
+            async with async_session_factory() as db:
+                warmed = await ProductService(db).warm_cache(settings.CACHE_WARM_SIZE)
+            logger.info(f"Warmed {warmed} products into the cache")
+        except Exception as e:
+            logger.error(f"Cache warming failed: {e}", exc_info=True)
+        
+        await asyncio.sleep(settings.CACHE_WARM_INTERVAL_SECONDS)
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     """Application lifespan context manager."""
@@ -31,10 +52,24 @@ async def lifespan(app: FastAPI):
     await init_db()
     logger.info("Database initialized")
     
+    # Pre-open pooled connections
+    await warm_pool()
+    logger.info("Database connection pool warmed")
+    
+    # Warm the product cache and listen for invalidations in the background
+    background_tasks = [
+        asyncio.create_task(warm_cache_periodically()),
+        asyncio.create_task(listen_for_product_changes()),
+    ]
+    
     yield
     
     # Shutdown
     logger.info("Shutting down application...")
+    for task in background_tasks:
+        task.cancel()
+    with suppress(asyncio.CancelledError):
+        await asyncio.gather(*background_tasks)
     await close_db()
     logger.info("Application shutdown complete")
 
@@ -46,6 +81,7 @@ app = FastAPI(
     docs_url="/api/docs",
     redoc_url="/api/redoc",
     openapi_url="/api/openapi.json",
+    default_response_class=ORJSONResponse,
     lifespan=lifespan
 )
 
@@ -58,6 +94,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress larger responses such as product lists (streamed NDJSON is left as is)
+app.add_middleware(StreamingAwareGZipMiddleware, minimum_size=1000)
+
 # Add exception handlers
 @app.exception_handler(RequestValidationError)
 async def validation_exception_handler(request: Request, exc: RequestValidationError):
@@ -0,0 +1,40 @@
+"""Custom ASGI middleware."""
+from starlette.datastructures import Headers
+from starlette.middleware.gzip import GZipMiddleware, GZipResponder
+from starlette.types import Message, Receive, Scope, Send
+
+# Streamed media types whose chunks must reach the client as they are sent
+UNCOMPRESSED_MEDIA_TYPES = ("application/x-ndjson",)
+
+
+class StreamingAwareGZipResponder(GZipResponder):
+    """GZip responder that passes streamed media types through uncompressed."""
+
+    async def send_with_gzip(self, message: Message) -> None:
+        await super().send_with_gzip(message)
+
+        if message["type"] == "http.response.start":
+            content_type = Headers(raw=message["headers"]).get("content-type", "")
+            if content_type.startswith(UNCOMPRESSED_MEDIA_TYPES):
+                # Reuse the responder's pass-through path for pre-encoded bodies
+                self.content_encoding_set = True
+
+
+class StreamingAwareGZipMiddleware(GZipMiddleware):
+    """
+    GZip middleware that leaves streamed NDJSON uncompressed.
+
+    The gzip compressor holds small chunks until its buffer fills, which
+    would stop NDJSON clients from parsing lines as they arrive.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http":
+            headers = Headers(scope=scope)
+            if "gzip" in headers.get("Accept-Encoding", ""):
+                responder = StreamingAwareGZipResponder(
+                    self.app, self.minimum_size, compresslevel=self.compresslevel
+                )
+                await responder(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -2,19 +2,33 @@
 from datetime import datetime
 from typing import Optional, List, Dict, Any
 
-from pydantic import BaseModel, Field, field_validator
+import msgspec
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from sqlalchemy import Computed, DateTime, func
+from sqlalchemy.dialects.postgresql import TSVECTOR
 from sqlmodel import SQLModel, Field as SQLField, Column, JSON, ARRAY, String
 
+# Full-text search document for products, shared by the model and init_db DDL
+SEARCH_VECTOR_EXPRESSION = (
+    "to_tsvector('simple', coalesce(name, '') || ' ' || "
+    "coalesce(brand, '') || ' ' || coalesce(category, ''))"
+)
+
 
 class TimestampModel(SQLModel):
-    """Base model with timestamp fields."""
+    """Base model with timestamp fields, set by the database."""
     created_at: Optional[datetime] = SQLField(
-        default_factory=datetime.utcnow, nullable=False
+        sa_column=Column(DateTime(timezone=True), server_default=func.now(), nullable=False),
+        default=None,
     )
     updated_at: Optional[datetime] = SQLField(
-        default_factory=datetime.utcnow,
-        nullable=False,
-        sa_column_kwargs={"onupdate": datetime.utcnow},
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now(),
+            nullable=False,
+        ),
+        default=None,
     )
 
 
@@ -54,12 +68,26 @@ class ProductBase(SQLModel):
 class Product(ProductBase, TimestampModel, table=True):
     """Product database model."""
     __tablename__ = "products"
+    # Fetch database-generated timestamps with RETURNING on insert/update
+    __mapper_args__ = {"eager_defaults": True}
     
     id: Optional[int] = SQLField(default=None, primary_key=True)
-    last_updated: datetime = SQLField(
-        default_factory=datetime.utcnow,
-        nullable=False,
-        sa_column_kwargs={"onupdate": datetime.utcnow},
+    last_updated: Optional[datetime] = SQLField(
+        sa_column=Column(
+            DateTime(timezone=True),
+            server_default=func.now(),
+            onupdate=func.now(),
+            nullable=False,
+        ),
+        default=None,
+    )
+    # Generated full-text search document over name, brand and category
+    search_vector: Optional[str] = SQLField(
+        sa_column=Column(
+            TSVECTOR,
+            Computed(SEARCH_VECTOR_EXPRESSION, persisted=True),
+        ),
+        default=None,
     )
 
 
@@ -106,6 +134,8 @@ class ProductUpdate(SQLModel):
 
 class ProductResponse(ProductBase):
     """Response model for product data."""
+    model_config = ConfigDict(from_attributes=True, ser_json_bytes="utf8")
+    
     id: int
     created_at: datetime
     updated_at: datetime
@@ -118,4 +148,48 @@ class ProductListResponse(SQLModel):
     items: List[ProductResponse]
     total: int
     page: int
-    size: int
\ No newline at end of file
+    size: int
+
+
+# msgspec mirrors of the response models for the barcode read path, where data
+# comes from our own database and needs no validation
+class NormalizedNutritionMsg(msgspec.Struct):
+    """Normalized nutrition data for encoding with msgspec."""
+    calories_100g: Optional[float] = None
+    carbs_100g: Optional[float] = None
+    sugar_100g: Optional[float] = None
+    fiber_100g: Optional[float] = None
+    protein_100g: Optional[float] = None
+    fat_100g: Optional[float] = None
+    saturated_fat_100g: Optional[float] = None
+    trans_fat_100g: Optional[float] = None
+    sodium_100g: Optional[float] = None
+    salt_100g: Optional[float] = None
+    general_health_score: Optional[float] = None
+    nutri_grade: Optional[str] = None
+
+
+class ProductResponseMsg(msgspec.Struct):
+    """Product response data for encoding with msgspec, mirroring ProductResponse."""
+    id: int
+    barcode: str
+    name: str
+    created_at: datetime
+    updated_at: datetime
+    last_updated: datetime
+    brand: Optional[str] = None
+    category: Optional[str] = None
+    package_size: Optional[float] = None
+    serving_size: Optional[float] = None
+    servings_per_package: Optional[float] = None
+    image_url: Optional[str] = None
+    ingredients_text: Optional[str] = None
+    ingredients_list: Optional[List[Dict[str, Any]]] = None
+    allergens: Optional[List[Dict[str, Any]]] = None
+    is_vegan: Optional[bool] = None
+    is_vegetarian: Optional[bool] = None
+    is_gluten_free: Optional[bool] = None
+    data_source: str = "openfoodfacts"
+    data_quality_score: Optional[float] = None
+    raw_nutrition_data: Optional[Dict[str, Any]] = None
+    normalized_nutrition: Optional[NormalizedNutritionMsg] = None
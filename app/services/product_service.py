@@ -1,26 +1,62 @@
 """Product service for handling product-related operations."""
+import asyncio
 import logging
-from datetime import datetime, timedelta
-from typing import Optional, List, Dict, Any
+import time
+from datetime import datetime, timezone
+from typing import Optional, List, Dict, Any, Tuple, AsyncIterator
 
-from sqlalchemy import select, update, delete, and_, or_
+import msgspec
+import orjson
+from sqlalchemy import select, update, delete, or_, func, lambda_stmt, literal_column
+from sqlalchemy.dialects.postgresql import insert as pg_insert
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy.orm import selectinload
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+from sqlalchemy.orm import defer, joinedload
+from redis.exceptions import RedisError
 
 from app.config import get_settings
+from app.database import product_cache_key, read_session, redis
 from app.models.product import (
     Product, 
     NormalizedNutrition, 
     ProductCreate, 
     ProductUpdate, 
     ProductResponse,
-    NormalizedNutritionBase
+    ProductResponseMsg,
+    NormalizedNutritionMsg
 )
 from app.services.openfoodfacts import OpenFoodFactsClient
 
 logger = logging.getLogger(__name__)
 settings = get_settings()
 
+# Product cache lifetime, precomputed for the freshness check
+_CACHE_SECONDS = settings.PRODUCT_CACHE_DAYS * 86400
+
+# Redis sorted set scoring barcode lookups, used to pick products for cache warming
+_POPULARITY_KEY = "products:popularity"
+
+# Held for one warm interval by whichever worker decays the popularity scores
+_POPULARITY_DECAY_LOCK_KEY = "products:popularity:decay-lock"
+
+# Read a cached product and, only on a hit, count the lookup in one round trip
+_GET_CACHED_PRODUCT = redis.register_script(
+    """
+    local value = redis.call('GET', KEYS[1])
+    if value then
+        redis.call('ZINCRBY', KEYS[2], 1, ARGV[1])
+    end
+    return value
+    """
+)
+
+# Attributes copied from ORM objects into the msgspec response structs
+_PRODUCT_MSG_FIELDS = tuple(
+    f for f in ProductResponseMsg.__struct_fields__ if f != "normalized_nutrition"
+)
+_NUTRITION_MSG_FIELDS = NormalizedNutritionMsg.__struct_fields__
+
+
 class ProductService:
     """Service for product-related operations."""
     
@@ -32,7 +68,7 @@ class ProductService:
         self, 
         barcode: str, 
         force_refresh: bool = False
-    ) -> Optional[ProductResponse]:
+    ) -> Optional[ProductResponseMsg]:
         """
         Get a product by its barcode, with cache-first strategy.
         
@@ -41,14 +77,22 @@ class ProductService:
             force_refresh: If True, force refresh from Open Food Facts
             
         Returns:
-            ProductResponse if found, None otherwise
+            ProductResponseMsg if found, None otherwise
         """
         # Check cache first if not forcing refresh
         if not force_refresh:
+            cached = await self._get_from_cache(barcode)
+            if cached:
+                logger.debug(f"Returning Redis-cached product with barcode {barcode}")
+                return cached
+            
             product = await self._get_from_database(barcode)
             if product and self._is_fresh(product.last_updated):
                 logger.debug(f"Returning cached product with barcode {barcode}")
-                return await self._to_response(product)
+                response = self._to_response_msg(product)
+                await self._set_cache(response)
+                await self._count_lookup(barcode)
+                return response
         
         # If not in cache or force_refresh, fetch from Open Food Facts
         logger.debug(f"Fetching product {barcode} from Open Food Facts")
@@ -59,9 +103,15 @@ class ProductService:
                 logger.info(f"Product with barcode {barcode} not found in Open Food Facts")
                 return None
                 
-            # Parse and save the product
-            product = await self._create_or_update_product(product_data)
-            return await self._to_response(product)
+            # Parse and save the product. Commit before caching so the cache never
+            # holds uncommitted data; an update's NOTIFY may still evict the
+            # entry, in which case the next lookup re-caches it from Postgres.
+            product = await self._create_or_update_product(product_data, client)
+            await self.db.commit()
+            response = self._to_response_msg(product)
+            await self._set_cache(response)
+            await self._count_lookup(barcode)
+            return response
     
     async def search_products(
         self,
@@ -82,49 +132,121 @@ class ProductService:
         Returns:
             Dictionary with products and pagination info
         """
-        # Build the base query
-        stmt = select(Product).options(
-            selectinload(Product.normalized_nutrition)
-        )
-        
-        # Apply filters
-        conditions = []
-        if query:
-            conditions.append(
-                or_(
-                    Product.name.ilike(f"%{query}%"),
-                    Product.brand.ilike(f"%{query}%"),
-                    Product.category.ilike(f"%{query}%")
-                )
-            )
-        if category:
-            conditions.append(Product.category.ilike(f"%{category}%"))
-        
-        if conditions:
-            stmt = stmt.where(and_(*conditions))
-        
         # Apply pagination
         offset = (page - 1) * page_size
-        stmt = stmt.offset(offset).limit(page_size)
-        
-        # Execute query
-        result = await self.db.execute(stmt)
-        products = result.scalars().all()
+        rows_stmt = self._search_page_stmt(query, category, offset, page_size)
+        count_stmt = self._search_filters(
+            lambda_stmt(lambda: select(func.count(Product.id))), query, category
+        )
         
-        # Get total count for pagination
-        count_stmt = select(Product)
-        if conditions:
-            count_stmt = count_stmt.where(and_(*conditions))
-        total = (await self.db.execute(select([func.count()]).select_from(count_stmt.subquery()))).scalar()
+        # Run the page and count queries concurrently. An AsyncSession cannot
+        # execute statements concurrently, so the count gets its own session.
+        async with read_session() as count_db:
+            rows_res, count_res = await asyncio.gather(
+                self.db.execute(rows_stmt),
+                count_db.execute(count_stmt),
+            )
+            products = rows_res.unique().scalars().all()
+            total = count_res.scalar_one()
         
         return {
-            "items": [await self._to_response(p) for p in products],
+            "items": [self._to_response(p) for p in products],
             "total": total,
             "page": page,
             "page_size": page_size,
             "total_pages": (total + page_size - 1) // page_size
         }
     
+    async def stream_products(
+        self,
+        query: str = None,
+        category: str = None,
+        page: int = 1,
+        page_size: int = 10
+    ) -> AsyncIterator[bytes]:
+        """
+        Stream matching products as newline-delimited JSON.
+        
+        Rows are fetched from a server-side cursor in batches and each product
+        is sent as soon as it is serialized, so memory stays bounded
+        regardless of page size. The session must be in a transaction for
+        the cursor to exist (see get_stream_db).
+        
+        Args:
+            query: Search query string
+            category: Filter by category
+            page: Page number (1-based)
+            page_size: Number of items per page
+            
+        Yields:
+            One JSON-encoded product per line
+        """
+        offset = (page - 1) * page_size
+        stmt = self._search_page_stmt(query, category, offset, page_size)
+        result = await self.db.stream_scalars(stmt, execution_options={"yield_per": 50})
+        async for product in result:
+            yield orjson.dumps(self._to_response(product).model_dump()) + b"\n"
+    
+    def _search_filters(
+        self,
+        stmt: StatementLambdaElement,
+        query: Optional[str],
+        category: Optional[str]
+    ) -> StatementLambdaElement:
+        """
+        Add product search filters to a lambda statement.
+        
+        Each filter is a lambda so SQLAlchemy caches the built statement and
+        its compiled SQL per filter combination. Search values are closure
+        variables, which SQLAlchemy extracts as bound parameters on each call.
+        """
+        if query and len(query) < 3:
+            # Too short for useful full-text matching, fall back to substring search
+            pattern = f"%{query}%"
+            stmt += lambda s: s.where(
+                or_(
+                    Product.name.ilike(pattern),
+                    Product.brand.ilike(pattern),
+                    Product.category.ilike(pattern)
+                )
+            )
+        elif query:
+            stmt += lambda s: s.where(
+                Product.search_vector.op("@@")(func.plainto_tsquery("simple", query))
+            )
+        if category:
+            category_pattern = f"%{category}%"
+            stmt += lambda s: s.where(Product.category.ilike(category_pattern))
+        return stmt
+    
+    def _search_page_stmt(
+        self,
+        query: Optional[str],
+        category: Optional[str],
+        offset: int,
+        limit: int
+    ) -> StatementLambdaElement:
+        """Build the cached statement selecting one page of search results."""
+        stmt = lambda_stmt(
+            lambda: select(Product).options(
+                joinedload(Product.normalized_nutrition), defer(Product.search_vector)
+            )
+        )
+        stmt = self._search_filters(stmt, query, category)
+        if query and len(query) >= 3:
+            # Rank full-text matches, breaking ties by id so pages don't overlap
+            stmt += lambda s: s.order_by(
+                func.ts_rank_cd(
+                    Product.search_vector, func.plainto_tsquery("simple", query)
+                ).desc(),
+                Product.id,
+            )
+        else:
+            # OFFSET paging needs a total order to return consistent pages
+            stmt += lambda s: s.order_by(Product.id)
+        stmt += lambda s: s.offset(offset).limit(limit)
+        return stmt
+    
     async def seed_from_openfoodfacts(
         self, 
         category: str, 
@@ -145,11 +267,14 @@ class ProductService:
         async with OpenFoodFactsClient() as client:
             products, total = await client.search_products(category, page_size=min(limit, 1000))
             
-            added = 0
-            updated = 0
             skipped = 0
             errors = 0
             
+            # Parse all products up front, keyed by barcode so that duplicates
+            # in the search results don't hit the same row twice in one upsert
+            product_rows: Dict[str, Dict[str, Any]] = {}
+            nutrition_rows: Dict[str, Dict[str, Any]] = {}
+            
             for product_data in products:
                 try:
                     # Skip if missing required fields
@@ -157,27 +282,25 @@ class ProductService:
                         skipped += 1
                         continue
                     
-                    # Check if product already exists
-                    existing = await self._get_from_database(product_data["code"])
-                    
                     # Parse the product data
-                    product = await self._parse_product_data(product_data)
+                    product = self._parse_product_data(product_data, client)
+                    if not product:
+                        errors += 1
+                        continue
                     
-                    if existing:
-                        # Update existing product
-                        await self._update_product(existing, product)
-                        updated += 1
-                    else:
-                        # Add new product
-                        await self._add_product(product)
-                        added += 1
+                    product_rows[product.barcode] = product.dict(exclude={"normalized_nutrition"})
+                    if product.normalized_nutrition:
+                        nutrition_rows[product.barcode] = product.normalized_nutrition.dict()
                         
                 except Exception as e:
                     logger.error(f"Error processing product {product_data.get('code')}: {e}", exc_info=True)
                     errors += 1
             
+            added, updated = await self._bulk_upsert_products(product_rows, nutrition_rows)
+            
             # Commit the transaction
             await self.db.commit()
+            await self._invalidate_cache(*product_rows)
             
             return {
                 "total_processed": len(products),
@@ -187,29 +310,214 @@ class ProductService:
                 "errors": errors
             }
     
+    async def _bulk_upsert_products(
+        self,
+        product_rows: Dict[str, Dict[str, Any]],
+        nutrition_rows: Dict[str, Dict[str, Any]]
+    ) -> Tuple[int, int]:
+        """
+        Insert or update products and their nutrition in two set-based statements.
+        
+        Args:
+            product_rows: Product column values keyed by barcode
+            nutrition_rows: Normalized nutrition column values keyed by barcode
+            
+        Returns:
+            Tuple of (added, updated) product counts
+        """
+        if not product_rows:
+            return 0, 0
+        
+        stmt = pg_insert(Product).values(list(product_rows.values()))
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[Product.barcode],
+            set_={
+                **{
+                    column: stmt.excluded[column]
+                    for column in next(iter(product_rows.values()))
+                    if column != "barcode"
+                },
+                "updated_at": func.now(),
+                "last_updated": func.now(),
+            },
+        ).returning(
+            Product.id,
+            Product.barcode,
+            # xmax is 0 only for freshly inserted rows
+            literal_column("xmax = 0").label("inserted"),
+        )
+        result = await self.db.execute(stmt)
+        
+        product_ids = {}
+        added = 0
+        for row in result:
+            product_ids[row.barcode] = row.id
+            added += int(row.inserted)
+        updated = len(product_ids) - added
+        
+        nutrition_payloads = [
+            {**nutrition, "product_id": product_ids[barcode]}
+            for barcode, nutrition in nutrition_rows.items()
+        ]
+        if nutrition_payloads:
+            stmt = pg_insert(NormalizedNutrition).values(nutrition_payloads)
+            # Replace every nutrition value on conflict, not just the keys present
+            # in the payloads, so stale values don't survive a re-seed
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[NormalizedNutrition.product_id],
+                set_={
+                    column.name: column
+                    for column in stmt.excluded
+                    if column.name not in ("id", "product_id")
+                },
+            )
+            await self.db.execute(stmt)
+        
+        logger.info(f"Upserted {len(product_ids)} products ({added} new, {updated} updated)")
+        return added, updated
+    
+    async def warm_cache(self, limit: int = 1000) -> int:
+        """
+        Load the most looked-up fresh products into Redis.
+        
+        Popularity scores are halved once per warm interval so that recent
+        demand outweighs old demand, and the long tail is trimmed to bound
+        memory. A Redis lock makes sure only one worker decays per interval.
+        
+        Args:
+            limit: Maximum number of products to warm
+            
+        Returns:
+            Number of products written to the cache
+        """
+        try:
+            barcodes = await redis.zrevrange(_POPULARITY_KEY, 0, limit - 1)
+            if await redis.set(
+                _POPULARITY_DECAY_LOCK_KEY,
+                1,
+                nx=True,
+                ex=settings.CACHE_WARM_INTERVAL_SECONDS,
+            ):
+                async with redis.pipeline(transaction=False) as pipe:
+                    pipe.zunionstore(_POPULARITY_KEY, {_POPULARITY_KEY: 0.5})
+                    pipe.zremrangebyrank(_POPULARITY_KEY, 0, -(limit * 10) - 1)
+                    await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Reading product popularity from Redis failed: {e}")
+            return 0
+        
+        if not barcodes:
+            return 0
+        
+        stmt = select(Product).where(Product.barcode.in_(barcodes)).options(
+            joinedload(Product.normalized_nutrition), defer(Product.search_vector)
+        )
+        result = await self.db.execute(stmt)
+        # Expire with the product's freshness, as in _set_cache. The TTL is
+        # computed once so the value checked is the value sent to Redis.
+        entries = []
+        for product in result.scalars().all():
+            ttl = int(self._remaining_freshness(product.last_updated))
+            if ttl > 0:
+                entries.append((self._to_response_msg(product), ttl))
+        
+        try:
+            async with redis.pipeline(transaction=False) as pipe:
+                for response, ttl in entries:
+                    pipe.set(
+                        product_cache_key(response.barcode),
+                        msgspec.json.encode(response),
+                        ex=ttl,
+                    )
+                await pipe.execute()
+        except RedisError as e:
+            logger.warning(f"Redis cache warming failed: {e}")
+            return 0
+        
+        return len(entries)
+    
+    async def _get_from_cache(self, barcode: str) -> Optional[ProductResponseMsg]:
+        """
+        Get a product from Redis, returning None on a miss or cache error.
+        
+        A hit also bumps the barcode's popularity score in the same round
+        trip, so hits served from Redis count towards cache warming.
+        """
+        try:
+            raw = await _GET_CACHED_PRODUCT(
+                keys=[product_cache_key(barcode), _POPULARITY_KEY], args=[barcode]
+            )
+        except RedisError as e:
+            logger.warning(f"Redis lookup failed for product {barcode}: {e}")
+            return None
+        
+        if not raw:
+            return None
+        
+        try:
+            return msgspec.json.decode(raw, type=ProductResponseMsg)
+        except msgspec.DecodeError as e:
+            logger.warning(f"Discarding unreadable cache entry for product {barcode}: {e}")
+            return None
+    
+    async def _set_cache(self, response: ProductResponseMsg) -> None:
+        """Store a product response in Redis until its data stops being fresh."""
+        # Redis hits skip _is_fresh, so the entry must expire when the data goes stale
+        ttl = int(self._remaining_freshness(response.last_updated))
+        if ttl <= 0:
+            return
+        
+        try:
+            await redis.set(
+                product_cache_key(response.barcode),
+                msgspec.json.encode(response),
+                ex=ttl,
+            )
+        except RedisError as e:
+            logger.warning(f"Redis write failed for product {response.barcode}: {e}")
+    
+    async def _count_lookup(self, barcode: str) -> None:
+        """Bump a found product's popularity score for cache warming."""
+        try:
+            await redis.zincrby(_POPULARITY_KEY, 1, barcode)
+        except RedisError as e:
+            logger.warning(f"Redis popularity update failed for product {barcode}: {e}")
+    
+    async def _invalidate_cache(self, *barcodes: str) -> None:
+        """Remove products from Redis."""
+        if not barcodes:
+            return
+        
+        try:
+            await redis.delete(*(product_cache_key(barcode) for barcode in barcodes))
+        except RedisError as e:
+            logger.warning(f"Redis invalidation failed for products {', '.join(barcodes)}: {e}")
+    
     async def _get_from_database(self, barcode: str) -> Optional[Product]:
         """Get a product from the database by barcode."""
         stmt = select(Product).where(Product.barcode == barcode).options(
-            selectinload(Product.normalized_nutrition)
+            joinedload(Product.normalized_nutrition), defer(Product.search_vector)
         )
         result = await self.db.execute(stmt)
         return result.scalars().first()
     
     async def _create_or_update_product(
         self, 
-        product_data: Dict[str, Any]
+        product_data: Dict[str, Any],
+        client: OpenFoodFactsClient
     ) -> Product:
         """
         Create or update a product from Open Food Facts data.
         
         Args:
             product_data: Raw product data from Open Food Facts
+            client: Open Food Facts client used to parse the data
             
         Returns:
             The created or updated Product instance
         """
         # Parse the product data
-        product = await self._parse_product_data(product_data)
+        product = self._parse_product_data(product_data, client)
         
         # Check if product exists
         existing = await self._get_from_database(product.barcode)
@@ -219,10 +527,13 @@ class ProductService:
         else:
             return await self._add_product(product)
     
-    async def _parse_product_data(self, product_data: Dict[str, Any]) -> ProductCreate:
-        """Parse raw product data into a ProductCreate instance."""
-        async with OpenFoodFactsClient() as client:
-            return client.parse_product(product_data)
+    def _parse_product_data(
+        self,
+        product_data: Dict[str, Any],
+        client: OpenFoodFactsClient
+    ) -> Optional[ProductCreate]:
+        """Parse raw product data into a ProductCreate instance using a shared client."""
+        return client.parse_product(product_data)
     
     async def _add_product(self, product: ProductCreate) -> Product:
         """Add a new product to the database."""
@@ -238,8 +549,9 @@ class ProductService:
             db_product.normalized_nutrition = db_nutrition
         
         self.db.add(db_product)
-        await self.db.commit()
+        await self.db.flush()
         await self.db.refresh(db_product)
+        await self._invalidate_cache(db_product.barcode)
         
         logger.info(f"Added new product: {db_product.name} ({db_product.barcode})")
         return db_product
@@ -268,29 +580,44 @@ class ProductService:
                     product_id=existing.id
                 )
         
-        await self.db.commit()
+        await self.db.flush()
         await self.db.refresh(existing)
+        await self._invalidate_cache(existing.barcode)
         
         logger.debug(f"Updated product: {existing.name} ({existing.barcode})")
         return existing
     
-    async def _to_response(self, product: Product) -> ProductResponse:
+    def _to_response(self, product: Product) -> Optional[ProductResponse]:
         """Convert a Product to a ProductResponse."""
         if not product:
             return None
-            
-        data = product.dict()
         
-        # Add normalized nutrition if it exists
-        if hasattr(product, 'normalized_nutrition') and product.normalized_nutrition:
-            data['normalized_nutrition'] = NormalizedNutritionBase.from_orm(product.normalized_nutrition)
+        # Read attributes (including normalized nutrition) straight off the ORM object
+        return ProductResponse.model_validate(product)
+    
+    def _to_response_msg(self, product: Product) -> Optional[ProductResponseMsg]:
+        """Convert a Product to a ProductResponseMsg without validation."""
+        if not product:
+            return None
         
-        return ProductResponse(**data)
+        nutrition = getattr(product, "normalized_nutrition", None)
+        return ProductResponseMsg(
+            **{f: getattr(product, f) for f in _PRODUCT_MSG_FIELDS},
+            normalized_nutrition=NormalizedNutritionMsg(
+                **{f: getattr(nutrition, f) for f in _NUTRITION_MSG_FIELDS}
+            ) if nutrition else None,
+        )
     
     def _is_fresh(self, last_updated: datetime) -> bool:
-        """Check if a product's data is fresh (less than 30 days old)."""
+        """Check if a product's data is fresh (within the product cache period)."""
+        return self._remaining_freshness(last_updated) > 0
+    
+    def _remaining_freshness(self, last_updated: datetime) -> float:
+        """Seconds until a product's data goes stale (zero or less if already stale)."""
         if not last_updated:
-            return False
-            
-        cache_days = settings.PRODUCT_CACHE_DAYS
-        return (datetime.utcnow() - last_updated) < timedelta(days=cache_days)
\ No newline at end of file
+            return 0
+        
+        # Naive timestamps are stored as UTC
+        if last_updated.tzinfo is None:
+            last_updated = last_updated.replace(tzinfo=timezone.utc)
+        return _CACHE_SECONDS - (time.time() - last_updated.timestamp())
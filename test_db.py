@@ -1,24 +1,32 @@
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker
+import asyncio
 import os
+
+import asyncpg
 from dotenv import load_dotenv
 
 # Load environment variables
 load_dotenv()
 
 # Test database connection
-def test_db_connection():
+async def test_db_connection():
     db_url = os.getenv("DATABASE_URL")
     if not db_url:
         print("DATABASE_URL not found in .env file")
         return
 
+    # asyncpg expects a plain postgresql:// DSN without the SQLAlchemy driver suffix
+    dsn = db_url.replace("postgresql+asyncpg://", "postgresql://")
+
     try:
-        engine = create_engine(db_url)
-        with engine.connect() as conn:
+        # Pre-create a pool of connections so the handshake cost is paid up front
+        pool = await asyncpg.create_pool(dsn, min_size=10, max_size=20, statement_cache_size=0)
+        try:
+            await pool.fetchval("SELECT 1")
             print("✅ Successfully connected to the database!")
+        finally:
+            await pool.close()
     except Exception as e:
         print(f"❌ Failed to connect to the database: {e}")
 
 if __name__ == "__main__":
-    test_db_connection()
+    asyncio.run(test_db_connection())